@@ -0,0 +1,265 @@
+"""
+Shared parser for the cross-section tables in DWUCK4 output files.
+
+The plotting scripts import the precompiled patterns and parse() from here
+instead of each carrying its own copy of the line loop.
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import mmap
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+
+import numpy as np
+
+
+# State title line, e.g. "36S(d,p)@ 16MeV    1000 keV  0f7/2 bound ZR"
+TITLE_RE = re.compile(rb'^.*36S\(d,p\).*$', re.M)
+# Excitation energy (keV) and orbital from a decoded title line
+KEV_RE = re.compile(r'(\d+)\s*keV\s*(\S+)?')
+# Cross-section table header and terminator lines
+THETA_HDR_RE = re.compile(rb'^.*Theta.*Inelsig.*$', re.M)
+TOT_SIG_RE = re.compile(rb'^.*Tot-sig.*$', re.M)
+# Table row: angle and Inelsig (first two columns)
+DATA_RE = re.compile(rb'^[^\S\n]*([-+]?\d+\.\d+)[^\S\n]+([-+]?\d+(?:\.\d+)?(?:[Ee][-+]?\d+)?)(?!\S)', re.M)
+
+_ROW_DTYPE = [('theta', float), ('cross_section', float)]
+
+
+def _marker_lines(mm, title_filter):
+    """Return {line offset: [line end, title or None, is_tot_sig, is_theta_hdr]}."""
+    lines = {}
+    for m in TITLE_RE.finditer(mm):
+        title = m.group(0).decode().strip()
+        if title_filter is None or title_filter(title):
+            lines.setdefault(m.start(), [m.end(), None, False, False])[1] = title
+    for m in TOT_SIG_RE.finditer(mm):
+        lines.setdefault(m.start(), [m.end(), None, False, False])[2] = True
+    for m in THETA_HDR_RE.finditer(mm):
+        lines.setdefault(m.start(), [m.end(), None, False, False])[3] = True
+    return lines
+
+
+def parse(path, title_filter=None):
+    """
+    Parse a DWUCK4 output file into one record per state title.
+
+    A state starts at each line matching TITLE_RE (and title_filter, if
+    given, called with the stripped title); table rows are collected between
+    a "Theta ... Inelsig" header and the next "Tot-sig" line or title.
+    States without rows are dropped.
+
+    The file is memory-mapped and scanned as bytes; each table region is
+    converted to arrays by one np.fromregex call, so only titles are turned
+    into Python objects.
+
+    Returns:
+        list of dict: {'title': str, 'theta': array, 'cross_section': array}
+    """
+    states = []
+    title = None
+    segments = []
+
+    def flush():
+        if title is not None and segments:
+            table = np.concatenate(segments)
+            if len(table):
+                states.append({
+                    'title': title,
+                    'theta': np.ascontiguousarray(table['theta']),
+                    'cross_section': np.ascontiguousarray(table['cross_section']),
+                })
+
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            markers = _marker_lines(mm, title_filter)
+            capture_from = None
+            for start in sorted(markers):
+                end, new_title, is_tot_sig, is_theta_hdr = markers[start]
+                # Any marker line ends the open table region
+                if capture_from is not None:
+                    segments.append(_table_rows(mm[capture_from:start]))
+                if new_title is not None:
+                    flush()
+                    title = new_title
+                    segments = []
+                # A header opens a table region, unless its line is also a terminator
+                capture_from = end if is_theta_hdr and not is_tot_sig else None
+
+            if capture_from is not None:
+                segments.append(_table_rows(mm[capture_from:]))
+    flush()
+    return states
+
+
+def cached_parse(path, parser, tag, cache=True):
+    """
+    Return parser(path), cached in a "<output>.<tag>.npz" sidecar file if cache is true.
+
+    parser must return a list of dicts with the same keys, each value either
+    a scalar (str or number) or a 1-D array, the arrays of one record having
+    a common length. The cache stores them as plain arrays (scalars
+    column-wise, arrays concatenated with per-record offsets), so it is read
+    back without pickle.
+
+    The cache is stored with the source's mtime and size and a hash of the
+    parser code, and is reused only while all three still match; tag keeps
+    the results of different parsers of the same file apart. Unreadable,
+    damaged or stale caches are re-parsed, and a cache that cannot be written
+    is skipped. The cache is written to a temporary file and renamed into
+    place, so a partial write is never read back.
+    """
+    if not cache:
+        return parser(path)
+    st = os.stat(path)
+    meta = np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+    version = np.array(_parser_version(parser.__module__))
+    cache_file = Path(path).with_suffix(f'.{tag}.npz')
+    try:
+        with np.load(cache_file, allow_pickle=False) as d:
+            if np.array_equal(d['meta'], meta) and d['version'] == version:
+                return _from_arrays(d)
+    except Exception:
+        # missing, truncated (EOFError, BadZipFile) or otherwise unreadable
+        pass
+
+    result = parser(path)
+    try:
+        f = tempfile.NamedTemporaryFile(dir=cache_file.parent, prefix=cache_file.name,
+                                        suffix='.tmp', delete=False)
+    except OSError:
+        return result
+    try:
+        with f:
+            np.savez(f, meta=meta, version=version, **_to_arrays(result))
+        os.replace(f.name, cache_file)
+    except OSError:
+        os.remove(f.name)
+    return result
+
+
+def _to_arrays(records):
+    """Flatten a list of records into the named arrays stored by cached_parse."""
+    names = list(records[0]) if records else []
+    array_names = [name for name in names if isinstance(records[0][name], np.ndarray)]
+    lens = [len(record[array_names[0]]) if array_names else 0 for record in records]
+    arrays = {'fields': np.array(names, dtype=str),
+              'array_fields': np.array(array_names, dtype=str),
+              'offsets': np.r_[0, np.cumsum(lens, dtype=np.int64)]}
+    for name in names:
+        values = [record[name] for record in records]
+        arrays[f'f_{name}'] = np.concatenate(values) if name in array_names else np.array(values)
+    return arrays
+
+
+def _from_arrays(d):
+    """Rebuild the list of records from the arrays written by _to_arrays."""
+    names = d['fields'].tolist()
+    array_names = set(d['array_fields'].tolist())
+    columns = {name: d[f'f_{name}'] if name in array_names else d[f'f_{name}'].tolist()
+               for name in names}
+    offsets = d['offsets']
+    return [{name: columns[name][lo:hi] if name in array_names else columns[name][i]
+             for name in names}
+            for i, (lo, hi) in enumerate(zip(offsets[:-1], offsets[1:]))]
+
+
+@lru_cache(maxsize=None)
+def _parser_version(module_name):
+    """SHA-1 of the source of the parser's module and of this module."""
+    h = hashlib.sha1()
+    for name in (module_name, __name__):
+        h.update(Path(sys.modules[name].__file__).read_bytes())
+    return h.hexdigest()
+
+
+def output_path(path, suffix):
+    """
+    Return the figure path for an output file: its extension replaced by suffix.
+
+    Returns None if that path is the output file itself, so it is never
+    overwritten.
+    """
+    stem = Path(path).with_suffix('')
+    out = stem.with_name(stem.name + suffix)
+    if out.resolve() == Path(path).resolve():
+        return None
+    return str(out)
+
+
+def parse_files(parser, paths):
+    """
+    Apply a module-level parser function to each path.
+
+    Several files are parsed in parallel worker processes; a single file is
+    parsed in-process. Returns a list of (path, result) in input order.
+    """
+    if len(paths) <= 1:
+        return [(path, parser(path)) for path in paths]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        return list(zip(paths, ex.map(parser, paths)))
+
+
+def plot_files_main(description, example, load, plot, suffix):
+    """
+    Command-line entry point shared by the per-output plot scripts.
+
+    Parses the output file (or --glob matches) named on the command line
+    with load(path, cache=...) via parse_files, and calls
+    plot(states, figure_path, dpi, fmt) for each one that has states. The
+    figure path is the output path with its extension replaced by
+    suffix.format(fmt=...). Exits with status 1 if nothing was plotted.
+    """
+    parser = argparse.ArgumentParser(description=description, epilog=f"Example: {example}")
+    parser.add_argument('filename', nargs='?', help='DWUCK4 output file')
+    parser.add_argument('--glob', help="Plot every output file matching this pattern (e.g. 'outputs/*.out'), parsing them in parallel")
+    parser.add_argument('--dpi', type=int, default=150, help='Resolution of the saved figure (default: 150)')
+    parser.add_argument('--format', default='png', help='Image format/extension (default: png)')
+    parser.add_argument('--cache', action='store_true', help='Keep parsed tables in an .npz file next to each output and reuse it while the output is unchanged')
+    args = parser.parse_args()
+
+    if args.glob:
+        files = sorted(glob.glob(args.glob))
+        if not files:
+            print(f"No files match: {args.glob}")
+            sys.exit(1)
+    elif args.filename:
+        files = [args.filename]
+    else:
+        parser.error("an output file or --glob is required")
+
+    try:
+        results = parse_files(partial(load, cache=args.cache), files)
+    except FileNotFoundError as e:
+        print(f"Output file not found: {e.filename}")
+        sys.exit(1)
+
+    plotted = 0
+    for filename, states in results:
+        if not states:
+            print(f"No states found in output: {filename}")
+            continue
+        figure_path = output_path(filename, suffix.format(fmt=args.format))
+        if figure_path is None:
+            print(f"Not plotting {filename}: the figure would overwrite it")
+            continue
+        plot(states, figure_path, args.dpi, args.format)
+        plotted += 1
+
+    if not plotted:
+        sys.exit(1)
+
+
+def _table_rows(region):
+    """Convert the table rows in a bytes region to a structured array."""
+    return np.fromregex(io.BytesIO(region), DATA_RE, dtype=_ROW_DTYPE)
@@ -4,12 +4,24 @@ Compare PTOLEMY and DWUCK4 angular distributions for validation.
 """
 
 import argparse
+import io
 import re
+import sys
+import warnings
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
 
 
+# PTOLEMY cross-section table row: angle, xs_cm, xs/ruth, ...
+_PTOLEMY_ROW = re.compile(r'^[^\S\n]+(\d+\.\d+)[^\S\n]+([\d.]+)[^\S\n]+([\d.]+)', re.M)
+# Lines that terminate the cross-section table
+_STOP = re.compile(r'TOTAL:|ANALYZING POWERS')
+# DWUCK4 header/title lines to skip
+_DWUCK_SKIP = re.compile(r'DWUCK|ANGLE|CENTER|---')
+# First characters a numeric DWUCK4 data line can start with
+_DATA_START = frozenset(' \t+-.0123456789')
+
+
 def parse_ptolemy_output(filepath):
     """
     Parse PTOLEMY output file to extract angular distributions.
@@ -17,42 +29,30 @@ def parse_ptolemy_output(filepath):
     Returns:
         dict: {'angle': np.array, 'cross_section': np.array, 'ratio_ruth': np.array}
     """
-    angles = []
-    cross_sections = []
-    ratio_ruth = []
-    
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    # Find the cross-section table (starts after "COMPUTATION OF CROSS SECTIONS")
+    # Collect the cross-section table (starts after "COMPUTATION OF CROSS SECTIONS"
+    # and stops at the total or the next section) while streaming the file
+    table_lines = []
     in_table = False
-    for i, line in enumerate(lines):
-        if 'COMPUTATION OF CROSS SECTIONS' in line:
-            # Skip header lines
-            in_table = True
-            continue
-        
-        if in_table:
-            # Stop at total or next section
-            if 'TOTAL:' in line or 'ANALYZING POWERS' in line:
-                break
-            
-            # Parse data lines (format: angle, xs_cm, xs/ruth, ...)
-            # Example: "   0.00   80.537      0.000000    1.94    0.00     0.0   ..."
-            match = re.match(r'\s+(\d+\.\d+)\s+([\d.]+)\s+([\d.]+)', line)
-            if match:
-                angle = float(match.group(1))
-                xs = float(match.group(2))
-                ruth = float(match.group(3))
-                
-                angles.append(angle)
-                cross_sections.append(xs)
-                ratio_ruth.append(ruth)
+    with open(filepath, 'r', buffering=1 << 20) as f:
+        for line in f:
+            if in_table:
+                if _STOP.search(line):
+                    break
+                table_lines.append(line)
+            elif 'COMPUTATION OF CROSS SECTIONS' in line:
+                in_table = True
+    
+    # Parse all data lines of the table in one pass (format: angle, xs_cm, xs/ruth, ...)
+    # Example: "   0.00   80.537      0.000000    1.94    0.00     0.0   ..."
+    table = np.fromregex(io.StringIO(''.join(table_lines)), _PTOLEMY_ROW,
+                         dtype=[('angle', float), ('cross_section', float), ('ratio_ruth', float)])
     
+    # Contiguous copies of the record fields, so np.interp and the statistics
+    # kernels do not re-copy strided views on every call
     return {
-        'angle': np.array(angles),
-        'cross_section': np.array(cross_sections),
-        'ratio_ruth': np.array(ratio_ruth)
+        'angle': np.ascontiguousarray(table['angle']),
+        'cross_section': np.ascontiguousarray(table['cross_section']),
+        'ratio_ruth': np.ascontiguousarray(table['ratio_ruth'])
     }
 
 
@@ -63,38 +63,28 @@ def parse_dwuck4_output(filepath):
     Returns:
         dict: {'angle': np.array, 'cross_section': np.array}
     """
-    angles = []
-    cross_sections = []
-    
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
     # Find cross-section data
     # DWUCK4 format varies, but typically has angle and xs columns
-    # Look for lines with angle and cross-section data
-    for line in lines:
-        # Skip header/title lines
-        if any(kw in line for kw in ['DWUCK', 'ANGLE', 'CENTER', '---']):
-            continue
-        
-        # Try to parse numeric data (angle, xs, ...)
-        # Format example: "  0.0    80.537    ..."
-        parts = line.split()
-        if len(parts) >= 2:
-            try:
-                angle = float(parts[0])
-                xs = float(parts[1])
-                
-                # Sanity check: angles should be 0-180
-                if 0 <= angle <= 180:
-                    angles.append(angle)
-                    cross_sections.append(xs)
-            except (ValueError, IndexError):
-                continue
+    # Skip lines that cannot start with a number (O(1) first-character test),
+    # then header/title lines, and let genfromtxt convert the first two columns;
+    # non-numeric entries become NaN and short lines are dropped
+    # Format example: "  0.0    80.537    ..."
+    with open(filepath, 'r', buffering=1 << 20) as f, warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        candidates = (line for line in f
+                      if line[:1] in _DATA_START and not _DWUCK_SKIP.search(line))
+        data = np.genfromtxt(candidates, usecols=(0, 1), comments=None,
+                             invalid_raise=False).reshape(-1, 2)
+    
+    angles = data[:, 0]
+    cross_sections = data[:, 1]
+    
+    # Sanity check: angles should be 0-180
+    keep = (0 <= angles) & (angles <= 180) & ~np.isnan(cross_sections)
     
     return {
-        'angle': np.array(angles),
-        'cross_section': np.array(cross_sections)
+        'angle': angles[keep],
+        'cross_section': cross_sections[keep]
     }
 
 
@@ -103,7 +93,8 @@ def calculate_statistics(ptolemy_data, dwuck_data):
     Calculate comparison statistics between PTOLEMY and DWUCK4.
     
     Returns:
-        dict: Statistics including RMS difference, max difference, etc.
+        tuple: (dict of statistics including RMS difference, max difference, etc.,
+                DWUCK4 cross sections interpolated onto the PTOLEMY angles)
     """
     # Interpolate to common angle grid
     common_angles = ptolemy_data['angle']
@@ -111,16 +102,25 @@ def calculate_statistics(ptolemy_data, dwuck_data):
     
     ptolemy_xs = ptolemy_data['cross_section']
     
-    # Calculate differences
-    abs_diff = np.abs(ptolemy_xs - dwuck_xs_interp)
-    rel_diff = abs_diff / (ptolemy_xs + 1e-10)  # Avoid division by zero
+    # Calculate differences (in place, one temporary per quantity)
+    abs_diff = ptolemy_xs - dwuck_xs_interp
+    np.abs(abs_diff, out=abs_diff)
+    
+    # Relative differences only where the PTOLEMY cross section is positive
+    positive = ptolemy_xs > 0
+    rel_diff = abs_diff[positive]
+    np.divide(rel_diff, ptolemy_xs[positive], out=rel_diff)
     
-    rms_abs = np.sqrt(np.mean(abs_diff**2))
-    rms_rel = np.sqrt(np.mean(rel_diff**2))
+    # Sums of squares as dot products, without squared temporaries
+    rms_abs = np.sqrt(np.dot(abs_diff, abs_diff) / len(abs_diff))
     max_abs = np.max(abs_diff)
-    max_rel = np.max(rel_diff)
+    if len(rel_diff):
+        rms_rel = np.sqrt(np.dot(rel_diff, rel_diff) / len(rel_diff))
+        max_rel = np.max(rel_diff)
+    else:
+        rms_rel = max_rel = np.nan
     
-    return {
+    stats = {
         'rms_absolute': rms_abs,
         'rms_relative': rms_rel * 100,  # as percentage
         'max_absolute': max_abs,
@@ -128,20 +128,53 @@ def calculate_statistics(ptolemy_data, dwuck_data):
         'mean_ptolemy': np.mean(ptolemy_xs),
         'mean_dwuck': np.mean(dwuck_xs_interp)
     }
+    
+    return stats, dwuck_xs_interp
+
+
+def log10_positive(values):
+    """log10 of values, with non-positive entries set to NaN (not drawn)."""
+    logs = np.full(len(values), np.nan)
+    np.log10(values, out=logs, where=values > 0)
+    return logs
 
 
-def plot_comparison(ptolemy_data, dwuck_data, output_path, stats):
+def plot_comparison(ptolemy_data, dwuck_data, output_path, stats, dwuck_xs_interp=None):
     """
     Create comparison plot of PTOLEMY vs DWUCK4 angular distributions.
+    
+    dwuck_xs_interp is the DWUCK4 cross section on the PTOLEMY angles as
+    returned by calculate_statistics; it is recomputed if not given.
     """
+    # Imported here so runs without a plot skip matplotlib entirely;
+    # Agg avoids probing for GUI backends
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FixedLocator, FuncFormatter
+    
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 10), 
                                      gridspec_kw={'height_ratios': [3, 1]})
     
-    # Main plot: cross-sections
-    ax1.semilogy(ptolemy_data['angle'], ptolemy_data['cross_section'], 
-                 'b-', linewidth=2, label='PTOLEMY', alpha=0.8)
-    ax1.semilogy(dwuck_data['angle'], dwuck_data['cross_section'], 
-                 'r--', linewidth=2, label='DWUCK4', alpha=0.8)
+    # Main plot: cross-sections, plotted as log10 on a linear axis with fixed
+    # decade ticks (avoids the log-scale locator/formatter on every draw)
+    p_log = log10_positive(ptolemy_data['cross_section'])
+    d_log = log10_positive(dwuck_data['cross_section'])
+    ax1.plot(ptolemy_data['angle'], p_log, 
+             'b-', linewidth=2, label='PTOLEMY', alpha=0.8)
+    ax1.plot(dwuck_data['angle'], d_log, 
+             'r--', linewidth=2, label='DWUCK4', alpha=0.8)
+    
+    all_log = np.concatenate([p_log, d_log])
+    ax1.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"$10^{{{int(v)}}}$"))
+    if np.isfinite(all_log).any():
+        lo, hi = np.floor(np.nanmin(all_log)), np.ceil(np.nanmax(all_log))
+        ticks = np.arange(lo, hi + 1)
+        if hi - lo <= 1:
+            # Within one decade no decade tick may be in view; tick 1x..9x of it instead
+            ticks = np.log10(np.outer(10.0 ** ticks, np.arange(1, 10)).ravel())
+            ax1.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{10 ** v:.3g}"))
+        ax1.yaxis.set_major_locator(FixedLocator(ticks))
     
     ax1.set_xlabel('Angle (degrees)', fontsize=12)
     ax1.set_ylabel('dσ/dΩ (mb/sr)', fontsize=12)
@@ -158,8 +191,11 @@ def plot_comparison(ptolemy_data, dwuck_data, output_path, stats):
     
     # Residual plot
     common_angles = ptolemy_data['angle']
-    dwuck_xs_interp = np.interp(common_angles, dwuck_data['angle'], dwuck_data['cross_section'])
-    residuals = (dwuck_xs_interp - ptolemy_data['cross_section']) / ptolemy_data['cross_section'] * 100
+    if dwuck_xs_interp is None:
+        dwuck_xs_interp = np.interp(common_angles, dwuck_data['angle'], dwuck_data['cross_section'])
+    residuals = np.subtract(dwuck_xs_interp, ptolemy_data['cross_section'])
+    residuals *= 100.0
+    np.divide(residuals, ptolemy_data['cross_section'], out=residuals)
     
     ax2.plot(common_angles, residuals, 'ko-', markersize=4, linewidth=1)
     ax2.axhline(y=0, color='r', linestyle='--', linewidth=1)
@@ -173,7 +209,7 @@ def plot_comparison(ptolemy_data, dwuck_data, output_path, stats):
     
     plt.tight_layout()
     plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    print(f"✓ Comparison plot saved to: {output_path}")
+    print(f"[OK] Comparison plot saved to: {output_path}")
     
     return fig
 
@@ -183,25 +219,30 @@ def main():
     parser.add_argument('--ptolemy', required=True, help='Path to PTOLEMY output file')
     parser.add_argument('--dwuck', required=True, help='Path to DWUCK4 output file')
     parser.add_argument('--output', default='comparison_plot.png', help='Output plot filename')
+    parser.add_argument('--no-plot', action='store_true', help='Only print statistics, skip the plot')
     
     args = parser.parse_args()
     
+    # Block-buffer progress output for batch runs
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
+    
     print("=" * 60)
     print("PTOLEMY vs DWUCK4 Validation")
     print("=" * 60)
     
     # Parse both outputs
-    print(f"\n📖 Parsing PTOLEMY output: {args.ptolemy}")
+    print(f"\n* Parsing PTOLEMY output: {args.ptolemy}")
     ptolemy_data = parse_ptolemy_output(args.ptolemy)
     print(f"   Found {len(ptolemy_data['angle'])} angle points")
     
-    print(f"\n📖 Parsing DWUCK4 output: {args.dwuck}")
+    print(f"\n* Parsing DWUCK4 output: {args.dwuck}")
     dwuck_data = parse_dwuck4_output(args.dwuck)
     print(f"   Found {len(dwuck_data['angle'])} angle points")
     
     # Calculate statistics
-    print("\n📊 Calculating comparison statistics...")
-    stats = calculate_statistics(ptolemy_data, dwuck_data)
+    print("\n* Calculating comparison statistics...")
+    stats, dwuck_xs_interp = calculate_statistics(ptolemy_data, dwuck_data)
     
     print(f"\n{'Results':^60}")
     print("-" * 60)
@@ -209,23 +250,24 @@ def main():
     print(f"  RMS Relative Difference: {stats['rms_relative']:.2f}%")
     print(f"  Max Absolute Difference: {stats['max_absolute']:.4f} mb/sr")
     print(f"  Max Relative Difference: {stats['max_relative']:.2f}%")
-    print(f"  Mean PTOLEMY σ:          {stats['mean_ptolemy']:.4f} mb/sr")
-    print(f"  Mean DWUCK4 σ:           {stats['mean_dwuck']:.4f} mb/sr")
+    print(f"  Mean PTOLEMY xs:         {stats['mean_ptolemy']:.4f} mb/sr")
+    print(f"  Mean DWUCK4 xs:          {stats['mean_dwuck']:.4f} mb/sr")
     print("-" * 60)
     
     # Validation assessment
     if stats['rms_relative'] < 5.0:
-        print("\n✅ EXCELLENT agreement (RMS < 5%)")
+        print("\n[OK] EXCELLENT agreement (RMS < 5%)")
     elif stats['rms_relative'] < 10.0:
-        print("\n✓  GOOD agreement (RMS < 10%)")
+        print("\n[OK] GOOD agreement (RMS < 10%)")
     elif stats['rms_relative'] < 20.0:
-        print("\n⚠  FAIR agreement (RMS < 20%) - check parameters")
+        print("\n[!]  FAIR agreement (RMS < 20%) - check parameters")
     else:
-        print("\n❌ POOR agreement (RMS > 20%) - parameters likely incorrect")
+        print("\n[X]  POOR agreement (RMS > 20%) - parameters likely incorrect")
     
     # Create comparison plot
-    print(f"\n📈 Creating comparison plot...")
-    plot_comparison(ptolemy_data, dwuck_data, args.output, stats)
+    if not args.no_plot:
+        print(f"\n* Creating comparison plot...")
+        plot_comparison(ptolemy_data, dwuck_data, args.output, stats, dwuck_xs_interp)
     
     print(f"\n{'Validation complete!':^60}\n")
     print("=" * 60)
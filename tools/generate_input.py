@@ -3,15 +3,23 @@
 Generate DWUCK4 input file from CSV state parameters.
 
 Usage:
-    python3 tools/generate_input.py inputs/36S_states.csv inputs/output.in
+    python3 tools/generate_input.py inputs/36S_states.csv inputs/output.in [--verbose]
     
 The CSV file should have columns:
-    Ex_keV, orbital, n, L, j_times_2, nodes, Q_MeV, E_bind_MeV
+    Ex_keV, orbital, n, L, j_times_2, nodes, Q_MeV, E_bind_MeV, E_proton_MeV
+(n is informational and may be omitted; other columns are ignored)
 """
 
 import sys
 import csv
-from pathlib import Path
+import itertools
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+log = logging.getLogger(__name__)
 
 
 # Fixed parameters (same for all states) for 36S(d,p)37S @ 8 MeV
@@ -40,7 +48,93 @@ FIXED_PARAMS = {
 }
 
 
-def calculate_proton_optical_model(E_proton):
+@dataclass(slots=True)
+class StateTable:
+    """A batch of states stored column-wise, one NumPy array per CSV column."""
+    Ex_keV: np.ndarray
+    orbital: np.ndarray
+    L: np.ndarray
+    j_times_2: np.ndarray
+    nodes: np.ndarray
+    Q_MeV: np.ndarray
+    E_bind_MeV: np.ndarray
+    E_proton_MeV: np.ndarray
+    # Derived F7.3 depth fields, filled in by add_derived_columns
+    W_D: np.ndarray = None
+    V_real: np.ndarray = None
+    W_surf: np.ndarray = None
+    VSO_real: np.ndarray = None
+    WSO_imag: np.ndarray = None
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a table from converted CSV rows in STATE_COLUMNS order."""
+        return cls(*[np.array(column, dtype=dtype)
+                     for (_, _, dtype), column in zip(STATE_COLUMNS, zip(*rows))])
+    
+    def __len__(self):
+        return len(self.Ex_keV)
+
+
+# CSV columns used on the cards, with their conversions and array dtypes
+STATE_COLUMNS = (
+    ('Ex_keV', int, np.int64),
+    ('orbital', str, object),   # free-form label, kept at full length
+    ('L', int, np.int64),
+    ('j_times_2', int, np.int64),
+    ('nodes', int, np.int64),
+    ('Q_MeV', float, np.float64),
+    ('E_bind_MeV', float, np.float64),
+    ('E_proton_MeV', float, np.float64),
+)
+
+# Proton optical model: reference depths at state 1 (E_x = 0 keV, E_p = 9.438 MeV)
+# and their linear energy dependence (MeV/MeV), extracted from comparison of
+# states 1 and 2 of the original DW_36S_DP.in file
+PROTON_E_REF = 9.438
+PROTON_DEPTHS_REF = {
+    'V_real': -56.249,   # Real volume depth
+    'W_surf': 34.836,    # Imaginary surface depth
+    'VSO_real': -0.786,  # Real spin-orbit depth
+    'WSO_imag': 0.156,   # Imaginary spin-orbit depth
+}
+PROTON_DEPTHS_SLOPE = {
+    'V_real': 0.405,
+    'W_surf': -0.415,
+    'VSO_real': 0.081,
+    'WSO_imag': -0.019,
+}
+
+# Deuteron imaginary surface depth vs Q-value (state 1: Q=2.079, W_D=42.340;
+# state 2: Q=1.434, W_D=43.432, so dW_D/dQ = -1.092/0.645 = -1.69)
+DEUTERON_Q_REF = 2.079
+DEUTERON_W_D_REF = 42.340
+DEUTERON_DW_D_DQ = -1.69
+
+# Blank card used to pad per-state cards to 80 columns by slicing
+_PAD80 = ' ' * 80
+
+# State-independent cards, padded to 80 columns once at import
+_TITLE_PREFIX_BOUND = FIXED_PARAMS['control_code_bound'] + "    " + FIXED_PARAMS['reaction'] + "    "
+_TITLE_PREFIX_UNBOUND = FIXED_PARAMS['control_code_unbound'] + "    " + FIXED_PARAMS['reaction'] + "    "
+_CARD2_FIXED = '+90.    +00.    +01.'.ljust(80)
+_INTEGRATION_BOUND = '+00.10  +00.    +050.'.ljust(80)    # RMAX = +50
+_INTEGRATION_UNBOUND = '+00.10  +00.    -015.'.ljust(80)  # NEGATIVE RMAX for unbound!
+_P1_C1 = '+08.000  2.0     1.0    36.0    16.0    001.303                  2.0'.ljust(80)
+_P1_C2 = '+01.    -92.976 +01.150 +00.761         -01.602 +01.335 +00.525 '
+_P1_C4 = '-04.    -14.228 +00.972 +01.011         +00.000 +00.000 +00.000 '
+_P3_C2 = '-01.    -01.    +01.28  +00.65  24.0'.ljust(80)
+
+# Per-state card templates (only the state fields vary), applied with %
+_TITLE_FMT = "%d keV  %s %s"
+_QN_FMT = "+%02d+01+%02d+%02d"
+_P1_C3_FMT = "+02.    +00.000 +00.000 +00.000         %s +01.380 +00.736 "
+_P2_C1_FMT = "%s  1.0     1.0    37.0    16.0    001.292                 +01.            "
+_P3_C1_FMT = "%s  1.0     0.0    36.0    16.0    +01.30                  +01.            "
+_P3_C3_FMT = "+%02.0f.    +%02.0f.    +%02.0f.    +01.    %+05.1f   +00.    +00.00"
+
+
+def calculate_proton_depths(E_proton):
     """
     Calculate energy-dependent proton optical model potential depths.
     
@@ -50,52 +144,73 @@ def calculate_proton_optical_model(E_proton):
     
     Parameters:
     -----------
-    E_proton : float
+    E_proton : float or np.ndarray
         Exit channel proton laboratory energy in MeV
         
     Returns:
     --------
-    dict : Dictionary containing formatted optical potential card lines
+    dict : Depths V_real, W_surf, VSO_real, WSO_imag (same shape as E_proton)
     """
-    # Reference energy and depths (from state 1: E_x = 0 keV)
-    E_ref = 9.438  # MeV
-    V_real_ref = -56.249  # Real volume depth
-    W_surf_ref = 34.836   # Imaginary surface depth
-    VSO_real_ref = -0.786 # Real spin-orbit depth
-    WSO_imag_ref = 0.156  # Imaginary spin-orbit depth
-    
-    # Linear energy dependence coefficients (MeV/MeV)
-    # Extracted from comparison of states 1 and 2
-    dV_dE = 0.405    # Real volume
-    dW_dE = -0.415   # Surface imaginary  
-    dVSO_dE = 0.081  # Real SO
-    dWSO_dE = -0.019 # Imaginary SO
-    
     # Calculate energy difference
-    dE = E_proton - E_ref
+    dE = E_proton - PROTON_E_REF
     
     # Calculate depths
-    V_real = V_real_ref + dV_dE * dE
-    W_surf = W_surf_ref + dW_dE * dE
-    VSO_real = VSO_real_ref + dVSO_dE * dE
-    WSO_imag = WSO_imag_ref + dWSO_dE * dE
+    return {name: PROTON_DEPTHS_REF[name] + PROTON_DEPTHS_SLOPE[name] * dE
+            for name in PROTON_DEPTHS_REF}
+
+
+def format_depth_fields(depths):
+    """
+    Format depth columns as DWUCK4 F7.3 fields (e.g. "-56.249"), one
+    vectorized np.char.mod sweep per column.
+    """
+    return {name: np.char.mod('%+07.3f', values) for name, values in depths.items()}
+
+
+def format_proton_cards(fields):
+    """
+    Format the three proton optical potential cards from a mapping of
+    formatted depth fields (V_real, W_surf, VSO_real, WSO_imag).
     
-    # Format the three optical potential cards
+    States sharing a proton energy have identical depths, so their cards are
+    formatted once and reused.
+    """
+    return _format_proton_cards(fields['V_real'], fields['W_surf'],
+                                fields['VSO_real'], fields['WSO_imag'])
+
+
+# Bounded (as is the block cache), so streaming a large CSV keeps memory flat
+@lru_cache(maxsize=4096)
+def _format_proton_cards(V_real, W_surf, VSO_real, WSO_imag):
     # Fixed geometries: r and a values don't change with energy
-    card2 = f"+01.    {V_real:+07.3f} +01.182 +00.672         {VSO_real:+07.3f} +01.182 +00.672 "
-    card3 = f"+02.    +00.000 +00.000 +00.000         {W_surf:+07.3f} +01.290 +00.538 "
-    card4 = f"-04.    -22.456 +00.991 +00.590         {WSO_imag:+07.3f} +00.991 +00.590 "
+    card2 = f"+01.    {V_real} +01.182 +00.672         {VSO_real} +01.182 +00.672 "
+    card3 = f"+02.    +00.000 +00.000 +00.000         {W_surf} +01.290 +00.538 "
+    card4 = f"-04.    -22.456 +00.991 +00.590         {WSO_imag} +00.991 +00.590 "
+    return card2, card3, card4
+
+
+def calculate_proton_optical_model(E_proton):
+    """
+    Calculate energy-dependent proton optical model potential depths and cards.
+    
+    Parameters:
+    -----------
+    E_proton : float
+        Exit channel proton laboratory energy in MeV
+        
+    Returns:
+    --------
+    dict : Dictionary containing formatted optical potential card lines
+    """
+    depths = calculate_proton_depths(E_proton)
+    fields = {name: f"{value:+07.3f}" for name, value in depths.items()}
+    card2, card3, card4 = format_proton_cards(fields)
     
     return {
         'card2': card2,
         'card3': card3,
         'card4': card4,
-        'depths': {
-            'V_real': V_real,
-            'W_surf': W_surf,
-            'VSO_real': VSO_real,
-            'WSO_imag': WSO_imag
-        }
+        'depths': depths
     }
 
 
@@ -182,190 +297,237 @@ def calculate_deuteron_W_surface(Q_value):
     
     Parameters:
     -----------
-    Q_value : float
+    Q_value : float or np.ndarray
         Reaction Q-value in MeV
         
     Returns:
     --------
-    float : Imaginary surface depth W_D in MeV
+    float or np.ndarray : Imaginary surface depth W_D in MeV
     """
-    # Reference from state 1
-    Q_ref = 2.079
-    W_D_ref = 42.340
-    
     # Linear dependence (negative because W_D increases as Q decreases)
-    # State 1: Q=2.079, W_D=42.340
-    # State 2: Q=1.434, W_D=43.432
-    # ΔQ = -0.645, ΔW_D = +1.092
-    # dW_D/dQ = -1.092/0.645 = -1.69
-    dW_D_dQ = -1.69  # MeV per MeV
-    
-    dQ = Q_value - Q_ref
-    W_D = W_D_ref + dW_D_dQ * dQ
+    dQ = Q_value - DEUTERON_Q_REF
+    W_D = DEUTERON_W_D_REF + DEUTERON_DW_D_DQ * dQ
     
     return W_D
 
 
-def format_state_block(state):
-    """Generate DWUCK4 input block for a single state."""
+@lru_cache(maxsize=None)
+def _qn_card(lmax, L, j2):
+    """Card 3 (LMAX, NLTR, L-transfer, 2*J), padded to 80 columns."""
+    return (_QN_FMT % (lmax, L, j2) + _PAD80)[:80]
+
+
+def add_derived_columns(table):
+    """
+    Compute the Q- and energy-dependent potential depths for all states at once.
+    
+    The depths are evaluated and formatted as F7.3 card fields on the table's
+    NumPy columns, and stored as its W_D, V_real, W_surf, VSO_real and
+    WSO_imag columns.
+    """
+    depths = calculate_proton_depths(table.E_proton_MeV)
+    depths['W_D'] = calculate_deuteron_W_surface(table.Q_MeV)
+    for name, values in format_depth_fields(depths).items():
+        setattr(table, name, values)
+    return table
+
+
+def format_state_block(table, i):
+    """
+    Generate DWUCK4 input block for state i of a StateTable, as one newline-joined string.
+    
+    The table must carry the derived depths from add_derived_columns.
+    """
+    return format_state_block_cached(
+        table.Ex_keV[i], table.orbital[i], table.L[i], table.j_times_2[i], table.nodes[i],
+        table.Q_MeV[i], table.E_bind_MeV[i],
+        table.W_D[i], table.V_real[i], table.W_surf[i], table.VSO_real[i], table.WSO_imag[i])
+
+
+@lru_cache(maxsize=4096)
+def format_state_block_cached(Ex_keV, orbital, L, j2, nodes, Q, E_bind,
+                              W_D, V_real, W_surf, VSO_real, WSO_imag):
+    """
+    Build the 15-card block for one state from its fields.
+    
+    Depths are the formatted F7.3 fields from add_derived_columns, so repeated
+    or duplicate states skip all formatting.
+    """
     lines = []
     
     # Determine if state is bound or unbound based on binding energy
-    E_bind = float(state['E_bind_MeV'])
     is_bound = E_bind < 0
     
-    # Select appropriate control code and marker
-    control_code = FIXED_PARAMS['control_code_bound'] if is_bound else FIXED_PARAMS['control_code_unbound']
+    # Select appropriate control code/title prefix and marker
+    title_prefix = _TITLE_PREFIX_BOUND if is_bound else _TITLE_PREFIX_UNBOUND
     bound_marker = 'bound ZR' if is_bound else 'unbound ZR'
     
     # Card 1: Title (80 chars fixed width)
-    title = f"{control_code}    {FIXED_PARAMS['reaction']}    {int(state['Ex_keV'])} keV  {state['orbital']} {bound_marker}"
-    title = title.ljust(80)  # Pad to 80 characters
+    title = title_prefix + _TITLE_FMT % (Ex_keV, orbital, bound_marker)
+    title = (title + _PAD80)[:80]  # Pad to 80 characters
     lines.append(title)
     
     # Card 2: Angles (fixed width: +90.    +00.    +01.)
-    lines.append('+90.    +00.    +01.                                                            ')
+    lines.append(_CARD2_FIXED)
     
     # Card 3: Quantum numbers (LMAX, NLTR, L-transfer, 2*J) - Fixed width
-    L = int(state['L'])
-    j2 = int(state['j_times_2'])
     # For unbound: use LMAX=15 to avoid buffer, bound: LMAX=30
     lmax = 15 if not is_bound else 30
-    qn_card = f"+{lmax:02d}+01+{L:02d}+{j2:02d}"
-    qn_card = qn_card.ljust(80)
-    lines.append(qn_card)
+    lines.append(_qn_card(lmax, L, j2))
     
     # Card 4: Integration parameters (NEGATIVE RMAX for unbound!)
-    rmax = -15.0 if not is_bound else 50.0
-    integration = f"+00.10  +00.    {rmax:+04.0f}."
-    integration = integration.ljust(80)
-    lines.append(integration)
+    lines.append(_INTEGRATION_BOUND if is_bound else _INTEGRATION_UNBOUND)
     
     # Cards 5-8: Particle 1 (Deuteron) - Fixed width format
     # Card 5: ELAB, masses, etc
-    p1_c1 = '+08.000  2.0     1.0    36.0    16.0    001.303                  2.0            '
-    lines.append(p1_c1)
-    
-    # Cards 6-8: Deuteron optical potential (energy-dependent for entrance channel)
-    deut_params = calculate_deuteron_optical_model(16.0)
-    Q = float(state['Q_MeV'])
-    W_D = calculate_deuteron_W_surface(Q)
+    lines.append(_P1_C1)
     
+    # Cards 6-8: Deuteron optical potential (fixed cards; only W_D varies with Q)
     # Card 6: Volume real + volume imaginary
-    p1_c2 = f"+01.    -92.976 +01.150 +00.761         -01.602 +01.335 +00.525 "
-    lines.append(p1_c2)
+    lines.append(_P1_C2)
     
     # Card 7: Surface imaginary (W_D varies with Q)
-    p1_c3 = f"+02.    +00.000 +00.000 +00.000         {W_D:+07.3f} +01.380 +00.736 "
+    p1_c3 = _P1_C3_FMT % W_D
     lines.append(p1_c3)
     
     # Card 8: Spin-orbit
-    p1_c4 = f"-04.    -14.228 +00.972 +01.011         +00.000 +00.000 +00.000 "
-    lines.append(p1_c4)
+    lines.append(_P1_C4)
     
     # Cards 9-12: Particle 2 (Proton) optical potential - energy-dependent
-    E_proton = float(state['E_proton_MeV'])
-    opt_pot = calculate_proton_optical_model(E_proton)
+    proton_cards = _format_proton_cards(V_real, W_surf, VSO_real, WSO_imag)
     
     # Card 9: Q-value line (MUST have proper sign formatting!)
     # DWUCK4 expects Q-value to be positive if Q > 0, negative if Q < 0
-    # The format is +07.3f for negative, +06.3f for positive with leading space
-    # Example: +02.079, -00.123
-    if Q >= 0:
-        Q_formatted = f"+{Q:06.3f}"
-    else:
-        Q_formatted = f"{Q:+07.3f}" # Negative sign included
-    
-    p2_c1 = f"{Q_formatted}  1.0     1.0    37.0    16.0    001.292                 +01.            "
+    # The explicit sign flag gives 7 chars either way, e.g. +02.079, -00.123
+    Q_formatted = f"{Q:+07.3f}"
+    
+    p2_c1 = _P2_C1_FMT % Q_formatted
     lines.append(p2_c1)
     
     # Cards 10-12: Proton optical potential
-    lines.append(opt_pot['card2'])
-    lines.append(opt_pot['card3'])
-    lines.append(opt_pot['card4'])
+    lines.extend(proton_cards)
     
     # Cards 13-15: Particle 3 (Bound/unbound neutron state)
-    E_bind = float(state['E_bind_MeV'])
     # DWUCK4 expects binding energy to be positive for bound states, negative for unbound
-    # The format is +06.3f for positive, +07.3f for negative with leading space
-    if E_bind >= 0:
-        E_bind_formatted = f"+{E_bind:06.3f}"
-    else:
-        E_bind_formatted = f"{E_bind:+07.3f}" # Negative sign included
+    E_bind_formatted = f"{E_bind:+07.3f}"
     
     # Card 13: Binding energy line
-    p3_c1 = f"{E_bind_formatted}  1.0     0.0    36.0    16.0    +01.30                  +01.            "
+    p3_c1 = _P3_C1_FMT % E_bind_formatted
     lines.append(p3_c1)
     
     # Card 14: Bound state potential
-    p3_c2 = '-01.    -01.    +01.28  +00.65  24.0                                            '
-    lines.append(p3_c2)
+    lines.append(_P3_C2)
     
     # Card 15: Quantum numbers with FISW=50.0 for unbound
-    nodes = int(state['nodes'])
     fisw = 50.0  # Non-zero for all states (let DWUCK4 decide)
-    p3_c3 = f"+{nodes:02.0f}.    +{L:02.0f}.    +{j2:02.0f}.    +01.    {fisw:+05.1f}   +00.    +00.00"
-    p3_c3 = p3_c3.ljust(80)
+    p3_c3 = (_P3_C3_FMT % (nodes, L, j2, fisw) + _PAD80)[:80]
     lines.append(p3_c3)
     
-    return lines
+    return '\n'.join(lines)
 
 
-def read_states(csv_file):
-    """Read state parameters from CSV file."""
-    states = []
-    with open(csv_file, 'r') as f:
-        reader = csv.DictReader(f, skipinitialspace=True)
+def _iter_rows(csv_file):
+    """Yield converted CSV rows, as lists in STATE_COLUMNS order."""
+    with open(csv_file, 'r', newline='') as f:
+        reader = csv.reader(f, skipinitialspace=True)
+        header = next(reader, [])
+        if 'Ex_keV' not in header:
+            return
+        missing = [name for name, _, _ in STATE_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"CSV file is missing column(s): {', '.join(missing)}")
+        ex_col = header.index('Ex_keV')
+        columns = [(header.index(name), convert) for name, convert, _ in STATE_COLUMNS]
         for row in reader:
             # Skip empty rows or comment lines
-            if not row or not row.get('Ex_keV'):
+            if len(row) <= ex_col or not row[ex_col]:
                 continue
-            if row['Ex_keV'].strip().startswith('#'):
+            if row[ex_col].strip().startswith('#'):
                 continue
-            states.append(row)
-    return states
+            try:
+                values = [convert(row[i]) for i, convert in columns]
+            except (IndexError, ValueError):
+                raise ValueError(f"Bad or missing value on line {reader.line_num} of {csv_file}") from None
+            yield values
+
+
+def iter_state_chunks(csv_file, chunksize=4096):
+    """Yield StateTables of at most chunksize states from the CSV file."""
+    rows = _iter_rows(csv_file)
+    while True:
+        chunk = list(itertools.islice(rows, chunksize))
+        if not chunk:
+            return
+        try:
+            table = StateTable.from_rows(chunk)
+        except OverflowError:
+            raise ValueError(f"Integer value out of range in {csv_file}") from None
+        yield table
 
 
 def generate_input_file(csv_file, output_file):
-    """Generate DWUCK4 input file from CSV state parameters."""
-    states = read_states(csv_file)
+    """
+    Generate DWUCK4 input file from CSV state parameters.
     
-    if not states:
-        print("Error: No states found in CSV file")
+    The CSV is streamed in chunks, so memory use stays bounded for large
+    state tables; each chunk is derived in one vectorized pass and written
+    with a single call.
+    """
+    chunks = iter_state_chunks(csv_file)
+    try:
+        first = next(chunks, None)
+    except FileNotFoundError:
+        print(f"Error: CSV file not found: {csv_file}")
+        return False
+    except ValueError as e:
+        print(f"Error: {e}")
         return False
     
-    print(f"Found {len(states)} states in {csv_file}")
+    if first is None:
+        print("Error: No states found in CSV file")
+        return False
     
     # Generate input file
-    with open(output_file, 'w') as f:
-        for i, state in enumerate(states):
-            print(f"  State {i+1}: {state['Ex_keV']} keV, {state['orbital']}")
+    n_states = 0
+    try:
+        with open(output_file, 'w', buffering=1 << 20) as f:
+            for table in itertools.chain([first], chunks):
+                add_derived_columns(table)
+                blocks = []
+                for i in range(len(table)):
+                    n_states += 1
+                    log.info("  State %d: %d keV, %s", n_states, table.Ex_keV[i], table.orbital[i])
+                    blocks.append(format_state_block(table, i))
+                f.write('\n'.join(blocks) + '\n')
             
-            # Write state block
-            block = format_state_block(state)
-            for line in block:
-                f.write(line + '\n')
-        
-        # Write end marker
-        f.write('9                   END OF DATA for DWUCK4\n')
+            # End marker
+            f.write('9                   END OF DATA for DWUCK4\n')
+    except ValueError as e:
+        # A bad row in a later chunk; the output is incomplete
+        print(f"Error: {e}")
+        return False
     
+    print(f"Found {n_states} states in {csv_file}")
     print(f"Successfully generated: {output_file}")
     return True
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python3 tools/generate_input.py <states.csv> <output.in>")
+    args = sys.argv[1:]
+    verbose = '--verbose' in args or '-v' in args
+    args = [a for a in args if a not in ('--verbose', '-v')]
+    
+    if len(args) != 2:
+        print("Usage: python3 tools/generate_input.py <states.csv> <output.in> [--verbose]")
         print("\nExample:")
         print("  python3 tools/generate_input.py inputs/36S_states.csv inputs/DW_36S_DP_auto.in")
         sys.exit(1)
     
-    csv_file = sys.argv[1]
-    output_file = sys.argv[2]
+    # Per-state progress is only reported with --verbose
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING,
+                        format='%(message)s')
     
-    if not Path(csv_file).exists():
-        print(f"Error: CSV file not found: {csv_file}")
-        sys.exit(1)
+    csv_file, output_file = args
     
     success = generate_input_file(csv_file, output_file)
     sys.exit(0 if success else 1)
@@ -8,60 +8,13 @@ Strict fixed-width formatting for "card" input.
 
 import sys
 
-def fmt_f8(val, decimal_places=3):
+import numpy as np
+
+def fmt_f8(val):
     """Format a float to exactly 8 characters width with sign."""
-    # DWUCK4 usually expects F8.4 (or similar), so 8 chars total.
-    # Standard format: "+XX.XXXX" or similar.
-    # Try {:+8.4f} but check length.
-    
-    # Special handling to match user templates which often use F8.3 or F8.2 padding spaces
-    # User examples: "+00.10  ", "+00.    ", "+50.0   "
-    # We will aim for "{:+8.xf}" 
-    
-    s = f"{val:+.{decimal_places}f}"
-    
-    # If too long, reduce precision?
-    # DWUCK bounds are usually small like +/- 200.
-    
-    # Just force valid float representation in 8 chars?
-    # Actually, Fortran F8.4 reading is flexible with spaces, but rigid with width.
-    # It reads 8 characters. If we provide "   +50.0", it parses 50.0.
-    # If we provide "+50.0   ", it parses 50.0.
-    
-    # Let's use standard rjust or ljust to ensure 8 chars.
-    # The generated file had "+00.10  ". 
-    # Let's just use f"{val:+8.3f}" (default python alignment).
-    # Python {:+8.3f} aligns to right by default? "+50.000" (7 chars). " +50.000".
-    
-    # Let's standardize:
-    # 1. Format number
-    # 2. Slice or Pad
-    
-    # For RMAX card: "+00.10  ", "+00.    ", "+050.   "
-    # It seems they use manual alignment.
-    
-    # Let's stick to simple: f"{val:+8.3f}" unless value needs more space.
-    # Actually, let's use a custom formatter to ensure exactly 8 chars.
-    
-    # If value is integer-ish like 50.0, print "+50.0   "
-    
-    # For this specific task, let's just make sure it fits.
-    
-    res = f"{val:+.3f}" # e.g. "+50.000" (7 chars)
-    if len(res) < 8:
-        # Pad with spaces on right to match "Card" look? 
-        # Or pad left? Fortran doesn't care if spaces are leading.
-        # But user template used "+00.10  " (Left aligned in field?)
-        # Let's pad Right for visual similarity to user file.
-        res = res.ljust(8)
-    else:
-        # If > 8 chars, we might have issue. e.g. -100.000 (8 chars) OK.
-        # -1000.000 (9 chars).
-        if len(res) > 8:
-            # removing digits?
-            res = f"{val:+.2f}".ljust(8)
-            
-    return res[:8] # Strictly truncate to 8 to avoid pushing next column
+    # Fortran reads F8.x by column width, so right-justified "+50.000" with a
+    # leading space parses the same as the left-aligned template fields.
+    return format(val, '+8.3f') if abs(val) < 1000 else format(val, '+8.2f')
 
 def get_base_parameters():
     """Return the fixed optical model parameters and GS quantum numbers."""
@@ -93,128 +46,119 @@ def get_base_parameters():
         'Nodes': 0,
     }
 
-def format_state(ex_mev, params):
-    """Generate a single state block with strict width."""
-    lines = []
+# Bound/unbound branch settings: (control, comment, LMAX, RMAX)
+BRANCHES = {
+    True: ('1001000000200000', 'bound ZR', 30, 50.0),
+    False: ('1011000030000000', 'unbound ZR', 15, -15.0),
+}
+
+# Blank card used to pad per-state cards to 80 columns by slicing
+_PAD80 = ' ' * 80
+
+# Particle 2 card 1 after the Q-value: FM, Z, FMA, ZA ... (fixed)
+P2_REST = "  1.0     1.0    37.0    16.0    001.292                 +01.            "
+
+
+def fmt_f8_array(values):
+    """Format a sequence of floats with fmt_f8."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.abs(values) < 1000,
+                    np.char.mod('%+8.3f', values),
+                    np.char.mod('%+8.2f', values)).tolist()
+
+
+# Every value this scan writes must fit its 8-column field
+assert all(len(fmt_f8(v)) == 8 for v in (90.0, 50.0, -15.0, 0.1, 2.079 - 7.0, -4.304 + 7.0))
+
+
+def build_constant_cards(params):
+    """Format the cards that do not depend on excitation energy, once per scan."""
+    # Card 2: Angles "+90.    +00.    +01." (10F8.4)
+    angles = (fmt_f8(90.0) + fmt_f8(0.0) + fmt_f8(1.0)).ljust(80)
+    
+    # Card 3: LMAX, NLTR, L, 2J (18I3) -> "+30+01+03+07"
+    # Card 4: DRF, RZ, RMAX (10F8.4) -> "+00.10  +00.    +50.0"
+    qn = {}
+    integration = {}
+    for is_bound, (_, _, lmax_val, rmax) in BRANCHES.items():
+        qn[is_bound] = f"{lmax_val:+03d}{1:+03d}{params['L']:+03d}{params['J2']:+03d}".ljust(80)
+        integration[is_bound] = (fmt_f8(0.1) + fmt_f8(0.0) + fmt_f8(rmax)).ljust(80)
+    
+    # Particle 3 last card: Nodes, L, J2, S, FISW, ... (10F8.4)
+    # Template: "+00.    +03.    +07.    +01.    +50.0   +00.    +00.00"
+    nodes = ''.join(fmt_f8_array([params['Nodes'], params['L'], params['J2'],
+                                   1.0, 50.0, 0.0, 0.0])).ljust(80)
     
-    q_val = params['Q_gs'] - ex_mev
-    be_val = params['BE_gs'] + ex_mev
-    is_bound = be_val < 0
+    return {
+        'angles': angles,
+        'qn': qn,
+        'integration': integration,
+        'p1': [params['p1_card1'], params['p1_card2'], params['p1_card3'], params['p1_card4']],
+        'p2': [params['p2_card2'], params['p2_card3'], params['p2_card4']],
+        'p3_mass': params['p3_mass'],
+        'p3_card2': params['p3_card2'],
+        'nodes': nodes,
+    }
+
+
+def compute_scan_values(ex_values, params):
+    """Return (ex, Q, BE, is_bound) arrays for a scan over excitation energies (MeV)."""
+    ex_arr = np.asarray(ex_values, dtype=float)
+    q_arr = params['Q_gs'] - ex_arr
+    be_arr = params['BE_gs'] + ex_arr
+    return ex_arr, q_arr, be_arr, be_arr < 0
+
+
+def format_scan(ex_values, params):
+    """Generate the state blocks for a scan over excitation energies (MeV)."""
+    cards = build_constant_cards(params)
+    p1_cards = cards['p1']
+    p2_cards = cards['p2']
+    
+    ex_arr, q_arr, be_arr, is_bound_arr = compute_scan_values(ex_values, params)
+    q_str_arr = fmt_f8_array(q_arr)
+    be_str_arr = fmt_f8_array(be_arr)
+    # Title excitation energy in whole keV, formatted as an integer
+    ex_kev_arr = np.rint(ex_arr * 1000).astype(int).tolist()
     
-    if is_bound:
-        control = '1001000000200000' # 16 chars
-        comment = 'bound ZR'
-        lmax_val = 30
-        rmax = 50.0
-    else:
-        control = '1011000030000000' # 16 chars
-        comment = 'unbound ZR'
-        lmax_val = 15
-        rmax = -15.0
+    lines = []
+    for ex_kev, is_bound, q_str, be_str in zip(ex_kev_arr, is_bound_arr.tolist(),
+                                               q_str_arr, be_str_arr):
+        control, comment, _, _ = BRANCHES[is_bound]
         
-    # Card 1: Control (20I1) + Title (15A4)
-    # Control needs 20 characters. 16 given + 4 spaces.
-    card1_ctrl = control.ljust(20) # cols 1-20
-    # Title: "36S(d,p)@ 8MeV    X keV  0f7/2 unbound ZR"
-    # Needs to fit in 60 chars (cols 21-80)
-    title_str = f"{params['title_base']}    {ex_mev*1000:.0f} keV  0f7/2 {comment}"
-    card1 = card1_ctrl + title_str
-    card1 = card1.ljust(80) # Ensure at least 80
-    lines.append(card1)
-    
-    # Card 2: Angles "+90.    +00.    +01."
-    # Format 10F8.4
-    # "+90." is 4 chars. "+90.    " is 8.
-    c2 = fmt_f8(90.0) + fmt_f8(0.0) + fmt_f8(1.0)
-    lines.append(c2.ljust(80))
-    
-    # Card 3: LMAX, NLTR, L, 2J
-    # Format: 18I3 (ADWCK4 line 47: READ (5,9002)L,NLTR...)
-    # 9002 FORMAT(18I3) -> 3 chars per integer.
-    # LMAX (2 digit), NLTR (2 digit), L (2 digit), 2J (2 digit).
-    # So "+30" (3 chars), "+01" (3 chars), "+03" (3 chars), "+07" (3 chars)
-    c3 = f"{lmax_val:+03d}{1:+03d}{params['L']:+03d}{params['J2']:+03d}"
-    # Verify: "+30+01+03+07" -> 12 characters. 4 integers * 3 chars. Correct.
-    lines.append(c3.ljust(80))
-    
-    # Card 4: DRF, RZ, RMAX, VCE, FNRNG, AMASS
-    # Format 10F8.4
-    drf = 0.1
-    rz = 0.0
-    # rmax varies
-    vce = 0.0
-    fnrng = 0.0
-    # amass if needed? template has "+00.10  +00.    +050.   "
-    # Wait, template line: "+00.10  +00.    +50.0"
-    # Field 1: +00.10
-    # Field 2: +00.
-    # Field 3: +50.0
-    c4 = fmt_f8(drf) + fmt_f8(rz) + fmt_f8(rmax)
-    lines.append(c4.ljust(80))
-    
-    # Particles
-    lines.append(params['p1_card1'])
-    lines.append(params['p1_card2'])
-    lines.append(params['p1_card3'])
-    lines.append(params['p1_card4'])
-    
-    # Particle 2 Q-value: Format F8.4?
-    # DWUCK4.FOR line 377 (POTS): READ (5,9000)E,FM...
-    # 9000 FORMAT(10F8.4)
-    # So Q-value should be first 8 chars.
-    q_str = fmt_f8(q_val)
-    # Remaining fields: FM, Z, FMA, ZA ...
-    # From template: "  1.0     1.0    37.0    16.0    001.292                 +01.            "
-    # these are fixed.
-    p2_rest = "  1.0     1.0    37.0    16.0    001.292                 +01.            "
-    lines.append(q_str + p2_rest)
-    
-    lines.append(params['p2_card2'])
-    lines.append(params['p2_card3'])
-    lines.append(params['p2_card4'])
-    
-    # Particle 3 Binding Energy
-    be_str = fmt_f8(be_val)
-    p3_rest = params['p3_mass']
-    lines.append(be_str + "  " + p3_rest) # Note: p3_mass string includes spacing
-    # Actually P3 Card 1 format: E(Bind), FM...
-    # Template: "-04.304  1.0     0.0    36.0    16.0    +01.30                  +01.    "
-    # Be careful with spacing between be_str and p3_rest.
-    # If be_str is 8 chars. Template "-04.304 " (8 chars? -04.304 is 7. space is 8?)
-    # "  1.0" starts at col 9? "  1.0" is 5 chars.
-    # Let's inspect p3_mass: "1.0     0.0..."
-    # If we append it directly to 8-char BE, it starts at col 9.
-    # "1.0     " is 8 chars.
-    # So be_str + p3_mass should work if p3_mass starts correctly.
-    
-    lines.append(params['p3_card2'])
-    
-    # Card 3 Nodes...
-    # Template: "+00.    +03.    +07.    +01.    +50.0   +00.    +00.00"
-    # Format 10F8.4 (READ 9000 in Bind/Pots)
-    # fields: Nodes(F8), L(F8), J2(F8), S(F8), FISW(F8)...
-    c_nodes = fmt_f8(params['Nodes']) # e.g. "+0.000  "
-    c_l = fmt_f8(params['L'])
-    c_j = fmt_f8(params['J2'])
-    c_s = fmt_f8(1.0) # Spin? Template "+01."
-    c_fisw = fmt_f8(50.0) # FISW
-    c_rest = fmt_f8(0.0) + fmt_f8(0.0)
-    
-    c_last = c_nodes + c_l + c_j + c_s + c_fisw + c_rest
-    lines.append(c_last.ljust(80))
+        # Card 1: Control (20I1) + Title (15A4, cols 21-80)
+        title_str = f"{params['title_base']}    {ex_kev:d} keV  0f7/2 {comment}"
+        lines.append((control.ljust(20) + title_str + _PAD80)[:80])
+        lines.append(cards['angles'])
+        lines.append(cards['qn'][is_bound])
+        lines.append(cards['integration'][is_bound])
+        
+        # Particles
+        lines.extend(p1_cards)
+        # Particle 2 Q-value occupies the first F8.4 field
+        lines.append(q_str + P2_REST)
+        lines.extend(p2_cards)
+        # Particle 3 binding energy; p3_mass starts at col 11
+        lines.append(be_str + "  " + cards['p3_mass'])
+        lines.append(cards['p3_card2'])
+        lines.append(cards['nodes'])
     
     return lines
 
+
+def format_state(ex_mev, params):
+    """Generate a single state block with strict width."""
+    return format_scan([ex_mev], params)
+
 def main():
     params = get_base_parameters()
     output_file = 'inputs/36S_scan_7MeV.in'
     
+    lines = format_scan(range(8), params)
+    lines.append('9                   END OF DATA for DWUCK4')
+    
     with open(output_file, 'w') as f:
-        for ex in range(8):
-            state_lines = format_state(float(ex), params)
-            for line in state_lines:
-                f.write(line + '\n')
-        f.write('9                   END OF DATA for DWUCK4\n')
+        f.write('\n'.join(lines) + '\n')
         
     print(f"Generated {output_file} w/ strict parsing.")
 
@@ -25,9 +25,14 @@ JSON format:
 The script produces a DW4-style block for each case; body_lines should contain the remaining card lines specific to your case.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
 import json
+import os
+
+# Below this many cases a process pool costs more than it saves
+PARALLEL_MIN_CASES = 64
 
 
 def format_header(code: str, title: str) -> str:
@@ -43,13 +48,15 @@ def format_angles(n: float, start: float, step: float) -> str:
     return f"{float(n):8.4f}{float(start):8.4f}{float(step):8.4f}\n"
 
 
+# 18I3 line templates, one per number of integers on the line
+_L_FMTS = ['%3d' * k + '\n' for k in range(19)]
+
+
 def format_l_line(nums) -> str:
     # Format as 18I3: up to 18 integers, each width 3 (right-justified)
-    parts = []
-    for v in nums:
-        parts.append(f"{int(v):3d}")
-    # pad to a reasonable length if needed
-    return ''.join(parts) + "\n"
+    ints = tuple(int(v) for v in nums)
+    fmt = _L_FMTS[len(ints)] if len(ints) < len(_L_FMTS) else '%3d' * len(ints) + '\n'
+    return fmt % ints
 
 
 def format_drf_rmax(drf: float, rmax: float) -> str:
@@ -58,28 +65,37 @@ def format_drf_rmax(drf: float, rmax: float) -> str:
 
 
 def build_case(case: dict) -> str:
-    out = ''
-    out += format_header(case.get('code', '0000000000000000'), case.get('title', 'DWUCK4 CASE'))
+    parts = []
+    parts.append(format_header(case.get('code', '0000000000000000'), case.get('title', 'DWUCK4 CASE')))
     ang = case.get('angles', {})
-    out += format_angles(ang.get('n', 55), ang.get('start', 0.0), ang.get('step', 3.3334))
+    parts.append(format_angles(ang.get('n', 55), ang.get('start', 0.0), ang.get('step', 3.3334)))
     # L line
     l_line = case.get('l_line')
     if l_line:
-        out += format_l_line(l_line)
+        parts.append(format_l_line(l_line))
     # DRF and RMAX
     dr = case.get('drf_rmax')
     if dr:
-        out += format_drf_rmax(dr.get('drf', 0.1), dr.get('rmax', 15.0))
+        parts.append(format_drf_rmax(dr.get('drf', 0.1), dr.get('rmax', 15.0)))
     # Optional additional body lines
-    for line in case.get('body_lines', []):
-        out += line.rstrip() + '\n'
+    parts.extend(line.rstrip() + '\n' for line in case.get('body_lines', []))
     # blank line separator
-    out += '\n'
-    return out
+    parts.append('\n')
+    return ''.join(parts)
+
+
+def build_cases(cases) -> list:
+    # Cases are independent, so large batches are formatted across processes;
+    # executor.map keeps the blocks in input order.
+    if len(cases) <= PARALLEL_MIN_CASES:
+        return [build_case(c) for c in cases]
+    chunksize = max(1, len(cases) // ((os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor() as ex:
+        return list(ex.map(build_case, cases, chunksize=chunksize))
 
 
 def interactive_case():
-    print('Interactive DWUCK4 .DAT case creator — press enter to accept defaults')
+    print('Interactive DWUCK4 .DAT case creator - press enter to accept defaults')
     code = input('Case code (16 digits) [1011000030000000]: ') or '1011000030000000'
     title = input('Title/description [O16(D,P)O17  D3/2+ UNBOUND STRIPPING]: ') or 'O16(D,P)O17  D3/2+ UNBOUND STRIPPING'
     n = input('Number of theta points (n) [55]: ') or '55'
@@ -160,7 +176,11 @@ def main():
     if args.sample:
         cases.append(sample_case())
     elif args.json:
-        cases = load_json(Path(args.json))
+        try:
+            cases = load_json(Path(args.json))
+        except FileNotFoundError:
+            print(f'Error: JSON file not found: {args.json}')
+            raise SystemExit(1)
     elif args.interactive:
         cases.append(interactive_case())
     else:
@@ -168,15 +188,18 @@ def main():
         return
 
     out_path = Path(args.out)
-    if not args.append:
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        out_path.write_text('')
 
+    # Build all case blocks first, then write them in one call
+    text = ''.join(build_cases(cases))
     mode = 'a' if args.append else 'w'
-    with out_path.open(mode) as f:
-        for c in cases:
-            block = build_case(c)
-            f.write(block)
+    try:
+        f = out_path.open(mode)
+    except FileNotFoundError:
+        # Only create the parent directory when it is actually missing
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        f = out_path.open(mode)
+    with f:
+        f.write(text)
 
     print(f'Wrote {len(cases)} case(s) to {out_path}')
 
@@ -2,93 +2,132 @@
 """
 Plot all bound states from DWUCK4 output with individual subplots.
 Usage:
-    python tools/plot_bound_states.py outputs/36S_bound_states.out outputs/bound_states_plot.png
+    python tools/plot_bound_states.py outputs/36S_bound_states.out outputs/bound_states_plot.png [--cache]
+
+--cache keeps the parsed tables in an .npz file next to the output and reuses
+it while the output is unchanged.
 """
 
+import io
 import re
 import sys
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
+from typing import NamedTuple
+
+from _dwuck_parse import cached_parse
+
+
+# Full title line of a state block, e.g. "36S(d,p)@ 8MeV    0 keV  0f7/2 bound ZR"
+_TITLE_LINE = re.compile(r'^.*36S\(d,p\).*$', re.M)
+_EX_KEV = re.compile(r'(\d+)\s*keV')
+_ORBITAL = re.compile(r'keV\s+(\S+)')
+# First line starting with a decimal number (start of the cross-section table)
+_FIRST_ROW = re.compile(r'^[^\S\n]*\d+\.\d+', re.M)
+# One table row: angle and cross section
+_DATA_ROW = re.compile(r'^[^\S\n]*(\d+\.\d+)[^\S\n]+([+-]?\d+\.\d+[Ee][+-]?\d+)', re.M)
+# A run of consecutive table rows
+_DATA_BLOCK = re.compile(r'(?:^[^\S\n]*\d+\.\d+[^\S\n]+[+-]?\d+\.\d+[Ee][+-]?\d+.*(?:\n|$))+', re.M)
 
 
 def parse_dwuck4_output(output_file):
     """
     Parse DWUCK4 output to extract angular distributions for each state.
     
+    The file is read once; state titles are located with a single regex scan
+    and each state's table is converted to arrays by np.fromregex.
+    
     Returns:
         list of dict: Each dict contains {'title': str, 'theta': array, 'cross_section': array}
     """
     states = []
-    
-    with open(output_file, 'r') as f:
-        lines = f.readlines()
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+    text = Path(output_file).read_text()
+    
+    pos = 0
+    for title_match in _TITLE_LINE.finditer(text):
+        # Titles inside the previous state's block were already consumed
+        if title_match.start() < pos:
+            continue
+        title = title_match.group(0).strip()
+        
+        # Extract excitation energy and orbital from title
+        ex_match = _EX_KEV.search(title)
+        ex_kev = int(ex_match.group(1)) if ex_match else 0
+        orbital_match = _ORBITAL.search(title)
+        orbital = orbital_match.group(1) if orbital_match else ''
+        
+        # Skip to the cross-section table (look for "Theta" header)
+        theta_pos = text.find('Theta', title_match.end())
+        if theta_pos < 0:
+            continue
         
-        # Look for state title line (contains "36S(d,p)")
-        if '36S(d,p)' in line:
-            title = line.strip()
-            
-            # Extract excitation energy from title
-            ex_match = re.search(r'(\d+)\s*keV', title)
-            ex_kev = int(ex_match.group(1)) if ex_match else 0
-            
-            # Extract orbital info
-            orbital_match = re.search(r'keV\s+(\S+)', title)
-            orbital = orbital_match.group(1) if orbital_match else ''
-            
-            # Skip to the cross-section table (look for "Theta" header)
-            j = i + 1
-            while j < len(lines) and 'Theta' not in lines[j]:
-                j += 1
-            
-            if j >= len(lines):
-                i += 1
-                continue
-            
-            # Skip the header line and any separator lines
-            j += 1
-            while j < len(lines) and not re.match(r'^\s*\d+\.\d+', lines[j]):
-                j += 1
-            
-            # Now parse the data rows
-            theta = []
-            cross_section = []
-            
-            while j < len(lines):
-                data_match = re.match(r'^\s*(\d+\.\d+)\s+([+-]?\d+\.\d+[Ee][+-]?\d+)', lines[j])
-                if data_match:
-                    theta.append(float(data_match.group(1)))
-                    cross_section.append(float(data_match.group(2)))
-                    j += 1
-                else:
-                    # End of this state's data
-                    break
-            
-            if theta and cross_section:
-                states.append({
-                    'title': title.strip(),
-                    'ex_kev': ex_kev,
-                    'orbital': orbital,
-                    'theta': np.array(theta),
-                    'cross_section': np.array(cross_section)
-                })
-            
-            i = j
-        else:
-            i += 1
+        # Skip the header line and any separator lines
+        header_end = text.find('\n', theta_pos)
+        row_match = _FIRST_ROW.search(text, header_end + 1) if header_end >= 0 else None
+        if row_match is None:
+            break
+        
+        # Convert the run of data rows in one call
+        block_match = _DATA_BLOCK.match(text, row_match.start())
+        if block_match is None:
+            pos = row_match.start()
+            continue
+        pos = block_match.end()
+        
+        table = np.fromregex(io.StringIO(block_match.group(0)), _DATA_ROW,
+                             dtype=[('theta', float), ('cross_section', float)])
+        states.append({
+            'title': title,
+            'ex_kev': ex_kev,
+            'orbital': orbital,
+            'theta': np.ascontiguousarray(table['theta']),
+            'cross_section': np.ascontiguousarray(table['cross_section'])
+        })
     
     return states
 
 
+class StateColumns(NamedTuple):
+    """Parsed states stored column-wise; state i's table is theta/cross_section[offsets[i]:offsets[i+1]]."""
+    title: np.ndarray
+    ex_kev: np.ndarray
+    orbital: np.ndarray
+    offsets: np.ndarray
+    theta: np.ndarray
+    cross_section: np.ndarray
+    
+    def table(self, i):
+        """Return (theta, cross_section) views for state i."""
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.theta[lo:hi], self.cross_section[lo:hi]
+
+
+def to_columns(states):
+    """Convert the list of state dicts from parse_dwuck4_output to StateColumns."""
+    n = len(states)
+    lens = np.fromiter((state['theta'].size for state in states), dtype=np.int64, count=n)
+    return StateColumns(
+        title=np.array([state['title'] for state in states], dtype=object),
+        ex_kev=np.fromiter((state['ex_kev'] for state in states), dtype=np.int32, count=n),
+        orbital=np.array([state['orbital'] for state in states], dtype=object),
+        offsets=np.r_[0, np.cumsum(lens)],
+        theta=np.concatenate([state['theta'] for state in states]),
+        cross_section=np.concatenate([state['cross_section'] for state in states]),
+    )
+
+
 def plot_bound_states(states, output_png):
     """
     Create a multi-panel plot with individual subplots for each state.
     """
-    n_states = len(states)
+    # matplotlib is imported here so --help and input errors exit quickly
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    
+    columns = to_columns(states)
+    n_states = len(columns.ex_kev)
     
     # Determine grid layout (aim for roughly square grid)
     ncols = int(np.ceil(np.sqrt(n_states)))
@@ -103,28 +142,37 @@ def plot_bound_states(states, output_png):
     else:
         axes = axes.flatten()
     
+    # y-axis limits for all states in one pass over the concatenated tables
+    flat = columns.cross_section
+    starts = columns.offsets[:-1]
+    ymaxs = np.maximum.reduceat(flat, starts)
+    ymins = np.minimum.reduceat(np.where(flat > 0, flat, np.inf), starts)
+    ymins[np.isinf(ymins)] = 1e-6
+    ymaxs[ymaxs <= 0] = 1
+    
     # Plot each state
-    for idx, state in enumerate(states):
+    for idx in range(n_states):
         ax = axes[idx]
         
-        theta = state['theta']
-        cs = state['cross_section']
+        theta, cs = columns.table(idx)
         
-        # Plot on log scale
-        ax.semilogy(theta, cs, 'b-', linewidth=1.5, marker='o', markersize=3)
+        # Plot on log scale: one collection per panel instead of a Line2D,
+        # with markers only where the points are sparse enough to see
+        ax.add_collection(LineCollection([np.column_stack([theta, cs])], colors='b', linewidths=1.5))
+        if len(theta) < 50:
+            ax.scatter(theta, cs, s=9, c='b')
+        ax.set_yscale('log')
+        ax.autoscale_view()
         
         # Labels and title
         ax.set_xlabel('θ (deg)', fontsize=9)
         ax.set_ylabel('dσ/dΩ (mb/sr)', fontsize=9)
-        ax.set_title(f"{state['ex_kev']} keV, {state['orbital']}", fontsize=10, fontweight='bold')
+        ax.set_title(f"{columns.ex_kev[idx]} keV, {columns.orbital[idx]}", fontsize=10, fontweight='bold')
         ax.grid(True, alpha=0.3, linestyle='--')
         ax.tick_params(labelsize=8)
         
         # Set reasonable y-axis limits
-        if len(cs) > 0:
-            ymin = np.min(cs[cs > 0]) if np.any(cs > 0) else 1e-6
-            ymax = np.max(cs) if np.max(cs) > 0 else 1
-            ax.set_ylim([ymin * 0.5, ymax * 2])
+        ax.set_ylim([ymins[idx] * 0.5, ymaxs[idx] * 2])
     
     # Hide any unused subplots
     for idx in range(n_states, len(axes)):
@@ -147,21 +195,24 @@ def plot_bound_states(states, output_png):
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python tools/plot_bound_states.py <output_file> <output_png>")
+    args = sys.argv[1:]
+    use_cache = '--cache' in args
+    args = [a for a in args if a != '--cache']
+    
+    if len(args) != 2:
+        print("Usage: python tools/plot_bound_states.py <output_file> <output_png> [--cache]")
         print("\nExample:")
         print("  python tools/plot_bound_states.py outputs/36S_bound_states.out outputs/bound_states_plot.png")
         sys.exit(1)
     
-    output_file = sys.argv[1]
-    output_png = sys.argv[2]
+    output_file, output_png = args
     
     if not Path(output_file).exists():
         print(f"Error: Output file not found: {output_file}")
         sys.exit(1)
     
     print(f"Parsing DWUCK4 output: {output_file}")
-    states = parse_dwuck4_output(output_file)
+    states = cached_parse(output_file, parse_dwuck4_output, 'bound_states', use_cache)
     
     if not states:
         print("Error: No states found in output file")
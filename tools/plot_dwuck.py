@@ -8,12 +8,26 @@ Usage:
 Reference CSV expected columns: theta, obs (comma-separated, header optional)
 Fit option: simple linear fit obs = a*model + b (least-squares)
 """
+import io
 import re
 import argparse
 import csv
+import warnings
 from pathlib import Path
 import numpy as np
 
+from _dwuck_parse import cached_parse
+
+
+# Table header: any line mentioning Theta
+HEADER_RE = re.compile(r'^.*Theta.*$', re.IGNORECASE | re.M)
+# Anything that looks like a data row (number, whitespace, number-ish token)
+ROW_START_RE = re.compile(r'^[^\S\n]*[+-]?[0-9]+(?:\.[0-9]*)?[^\S\n]+[+-]?[0-9Ee.+-]+', re.M)
+# A data row whose second token is a valid float, and a run of such rows
+_ROW = r'^[^\S\n]*([+-]?[0-9]+(?:\.[0-9]*)?)[^\S\n]+([+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[Ee][+-]?[0-9]+)?)(?![0-9Ee.+-])'
+DATA_RE = re.compile(_ROW, re.M)
+DATA_BLOCK_RE = re.compile(r'(?:' + _ROW + r'.*(?:\n|$))+', re.M)
+
 
 def parse_output(path):
     """Parse the DWUCK4 textual output and return a list of data series.
@@ -21,87 +35,83 @@ def parse_output(path):
     The parser searches for table headers containing 'Theta' and then numeric rows.
     """
     series = []
-    header_re = re.compile(r'Theta', re.IGNORECASE)
-    data_re = re.compile(r'^\s*([+-]?[0-9]+(?:\.[0-9]*)?)\s+([+-]?[0-9Ee.+-]+)')
-
-    text = Path(path).read_text()
-    lines = text.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if header_re.search(line):
-            # collect subsequent lines that look like data rows
-            j = i+1
-            thetas = []
-            ys = []
-            # sometimes header is followed by a label row we should skip; scan until numeric lines
-            while j < len(lines):
-                m = data_re.match(lines[j])
-                if m:
-                    # parse repeatedly until we hit a non-data line or blank
-                    while j < len(lines):
-                        m2 = data_re.match(lines[j])
-                        if not m2:
-                            break
-                        try:
-                            theta = float(m2.group(1))
-                            y = float(m2.group(2))
-                        except Exception:
-                            break
-                        thetas.append(theta)
-                        ys.append(y)
-                        j += 1
-                    break
-                else:
-                    j += 1
-            if thetas:
-                # build a title from the nearest preceding non-empty line that looks like a case label
-                title = ''
-                # search backward for a descriptive line (e.g., that contains reaction name) up to 6 lines
-                for k in range(max(0, i-6), i):
-                    if lines[k].strip() and not lines[k].strip().startswith('0'):
-                        title = lines[k].strip()
-                        break
-                if not title:
-                    title = f'Series starting line {i+1}'
-                series.append({'title': title, 'theta': np.array(thetas), 'y': np.array(ys)})
-                i = j
-                continue
-        i += 1
+    lines = Path(path).read_text().splitlines()
+    # Rejoin on '\n' so regex line anchors agree with splitlines()
+    text = '\n'.join(lines)
+    line_starts = np.cumsum([0] + [len(line) + 1 for line in lines[:-1]])
+
+    pos = 0
+    while True:
+        header = HEADER_RE.search(text, pos)
+        if header is None:
+            break
+        i = int(np.searchsorted(line_starts, header.start(), side='right')) - 1
+        next_line = header.end() + 1
+        pos = next_line
+
+        # sometimes header is followed by a label row we should skip; scan until numeric lines
+        row = ROW_START_RE.search(text, next_line)
+        if row is None:
+            continue
+        # parse the run of data rows until we hit a non-data line or blank
+        block = DATA_BLOCK_RE.match(text, row.start())
+        if block is None:
+            continue
+        table = np.fromregex(io.StringIO(block.group(0)), DATA_RE,
+                             dtype=[('theta', float), ('y', float)])
+
+        # build a title from the nearest preceding non-empty line that looks like a case label
+        title = ''
+        # search backward for a descriptive line (e.g., that contains reaction name) up to 6 lines
+        for k in range(max(0, i-6), i):
+            if lines[k].strip() and not lines[k].strip().startswith('0'):
+                title = lines[k].strip()
+                break
+        if not title:
+            title = f'Series starting line {i+1}'
+        series.append({'title': title,
+                       'theta': np.ascontiguousarray(table['theta']),
+                       'y': np.ascontiguousarray(table['y'])})
+        pos = block.end()
     return series
 
 
 def read_reference_csv(path):
-    p = Path(path)
-    thetas = []
-    obs = []
-    with p.open() as f:
-        reader = csv.reader(f)
-        # try to detect header: if first row has non-numeric entries, skip
-        first = next(reader, None)
-        if first is None:
-            return np.array([]), np.array([])
-        def is_numeric(s):
-            try:
-                float(s)
-                return True
-            except Exception:
-                return False
-        if not is_numeric(first[0]):
-            # header; attempt to use remaining rows
-            for row in reader:
-                if not row: continue
-                thetas.append(float(row[0]))
-                obs.append(float(row[1]))
-        else:
-            # first row numeric
-            thetas.append(float(first[0]))
-            obs.append(float(first[1]))
-            for row in reader:
-                if not row: continue
-                thetas.append(float(row[0]))
-                obs.append(float(row[1]))
-    return np.array(thetas), np.array(obs)
+    """Read (theta, obs) from the first two columns of a CSV; a header row is optional."""
+    # the first row is a header if its first field is not a number
+    with open(path, newline='') as f:
+        first = next(csv.reader(f), None)
+    skiprows = 1 if first and not _is_numeric(first[0]) else 0
+    with warnings.catch_warnings():
+        # an empty file just yields empty arrays
+        warnings.simplefilter('ignore', UserWarning)
+        arr = np.loadtxt(path, delimiter=',', quotechar='"', usecols=(0, 1), ndmin=2,
+                         dtype=np.float64, skiprows=skiprows)
+    return arr[:, 0], arr[:, 1]
+
+
+def _is_numeric(s):
+    try:
+        float(s)
+        return True
+    except ValueError:
+        return False
+
+
+def interp_linear(x, xp, fp):
+    """Piecewise-linear interpolation of (xp, fp) at x, extrapolating the end segments."""
+    order = np.argsort(xp, kind='stable')
+    xp = np.asarray(xp, dtype=float)[order]
+    fp = np.asarray(fp, dtype=float)[order]
+    x = np.asarray(x, dtype=float)
+    y = np.interp(x, xp, fp)
+    below = x < xp[0]
+    above = x > xp[-1]
+    if below.any():
+        y[below] = fp[0] + (x[below] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+    if above.any():
+        y[above] = fp[-1] + (x[above] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    return y
 
 
 def fit_model(model_theta, model_y, ref_theta, ref_y):
@@ -109,17 +119,20 @@ def fit_model(model_theta, model_y, ref_theta, ref_y):
     Interpolate model to reference theta points, then solve for a,b.
     Returns (a,b), and fitted_model_at_ref
     """
-    from scipy.interpolate import interp1d
-    from numpy.linalg import lstsq
-    interp = interp1d(model_theta, model_y, kind='linear', bounds_error=False, fill_value='extrapolate')
-    model_at_ref = interp(ref_theta)
+    model_at_ref = interp_linear(ref_theta, model_theta, model_y)
     A = np.vstack([model_at_ref, np.ones_like(model_at_ref)]).T
-    x, *_ = lstsq(A, ref_y, rcond=None)
+    # lstsq gives the minimum-norm solution when the system is underdetermined
+    # (a single reference point or a constant model)
+    x, *_ = np.linalg.lstsq(A, ref_y, rcond=None)
     a, b = x[0], x[1]
     fitted = a * model_at_ref + b
     return (a, b), model_at_ref, fitted
 
 
+# Above this many points per series, draw lines only (one SVG marker per point is slow to render)
+MARKERS_MAX_POINTS = 40
+
+
 def plot_series(series_list, out_html, ref_file=None, do_fit=False):
     import plotly.graph_objects as go
     fig = go.Figure()
@@ -129,7 +142,8 @@ def plot_series(series_list, out_html, ref_file=None, do_fit=False):
         theta = s['theta']
         y = s['y']
         name = s['title']
-        fig.add_trace(go.Scatter(x=theta, y=y, mode='markers+lines', name=name))
+        mode = 'lines' if len(theta) > MARKERS_MAX_POINTS else 'markers+lines'
+        fig.add_trace(go.Scatter(x=theta, y=y, mode=mode, name=name, line=dict(width=1.5)))
 
     fit_results = None
     if ref_file:
@@ -142,7 +156,7 @@ def plot_series(series_list, out_html, ref_file=None, do_fit=False):
             fig.add_trace(go.Scatter(x=ref_theta, y=fitted, mode='lines', name=f'Fit (a={a:.4g}, b={b:.4g})', line=dict(dash='dash')))
             fit_results = {'a': float(a), 'b': float(b)}
 
-    fig.update_layout(title='DWUCK4 Results', xaxis_title='Theta (deg)', yaxis_title='Value', template='plotly_white')
+    fig.update_layout(title='DWUCK4 Results', xaxis_title='Theta (deg)', yaxis_title='Value', template='plotly_white', hovermode='x unified')
     Path(out_html).parent.mkdir(parents=True, exist_ok=True)
     fig.write_html(out_html, include_plotlyjs='cdn')
     return fit_results
@@ -154,9 +168,10 @@ def main():
     parser.add_argument('--out', '-o', default='outputs/dwuck_plot.html', help='Output HTML file')
     parser.add_argument('--ref', '-r', help='Reference CSV file (theta,obs)')
     parser.add_argument('--fit', action='store_true', help='Fit model to reference data (linear scaling + offset)')
+    parser.add_argument('--cache', action='store_true', help='Keep parsed series in an .npz file next to the input and reuse it while the input is unchanged')
     args = parser.parse_args()
 
-    series = parse_output(args.input)
+    series = cached_parse(args.input, parse_output, 'series', args.cache)
     if not series:
         print('No series found in input. Exiting.')
         return
@@ -1,99 +1,59 @@
-import matplotlib.pyplot as plt
-import re
-import sys
 import numpy as np
 
-def parse_dwuck_output(filename):
+from _dwuck_parse import cached_parse, parse, plot_files_main
+
+def _scan_records(filename):
+    """Table records of the scan states (titles mentioning keV) in filename."""
+    return parse(filename, title_filter=lambda line: "keV" in line)
+
+def parse_dwuck_output(filename, cache=False):
     """
     Parse DWUCK4 output to extract cross sections for each state.
     Returns a dict: {excitation_energy: (angles, cross_sections)}
+    With cache=True the parsed tables are kept in an "<output>.overlay.npz"
+    file next to the output until it changes.
     """
     states = {}
     current_ex = None
-    angles = []
-    xsecs = []
-    capture_data = False
     
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-        
-    for line in lines:
-        # Check for new state header
-        # Line format often: 1001... 36S(d,p)...  1000 keV ...
-        if "36S(d,p)" in line and "keV" in line:
-            # If we were capturing, save previous state
-            if current_ex is not None and angles:
-                states[current_ex] = (np.array(angles), np.array(xsecs))
-                angles = []
-                xsecs = []
-            
-            # Extract Ex
-            try:
-                # "   1000 keV"
-                parts = line.split("keV")[0].strip().split()
-                ex_kev_str = parts[-1]
-                current_ex = int(ex_kev_str) / 1000.0 # to MeV
-            except:
-                pass
-            capture_data = False
-            
-        if "Tot-sig" in line:
-            capture_data = False
-            continue
-
-        # Check for cross section data block start
-        if "Theta" in line and "Inelsig" in line:
-            capture_data = True
-            continue
-            
-        if capture_data:
-            # Data lines: Angle  Inelsig ...
-            # 10.00    1.234E-01
-            try:
-                parts = line.strip().split()
-                if len(parts) >= 2:
-                     # Check if first part is a number
-                     try:
-                        ang = float(parts[0])
-                        xs = float(parts[1]) # Inelsig is col 1
-                     except ValueError:
-                        # Skip non-numeric lines (like other headers)
-                        continue
-                        
-                     angles.append(ang)
-                     xsecs.append(xs)
-            except ValueError:
-                pass
-                
-    # Save last state
-    if current_ex is not None and angles:
-        states[current_ex] = (np.array(angles), np.array(xsecs))
+    # Title line format often: 1001... 36S(d,p)...  1000 keV ...
+    for state in cached_parse(filename, _scan_records, 'overlay', cache):
+        try:
+            # "   1000 keV"
+            ex_kev_str = state['title'].split("keV")[0].split()[-1]
+            current_ex = int(ex_kev_str) / 1000.0 # to MeV
+        except (IndexError, ValueError):
+            pass
+        if current_ex is not None:
+            states[current_ex] = (state['theta'], state['cross_section'])
         
     return states
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 tools/plot_scan_overlay.py outputs/36S_scan_7MeV.out")
-        sys.exit(1)
-        
-    filename = sys.argv[1]
-    states = parse_dwuck_output(filename)
-    
-    if not states:
-        print("No states found in output.")
-        sys.exit(1)
+# Above this many curves, lines are rasterized to keep the saved file small
+RASTERIZE_MIN_STATES = 20
+
+def plot_overlay(states, output_png, dpi, fmt):
+    """Overlay the scan states, sorted by Ex, and save the figure to output_png."""
+    # Imported only once there is something to plot
+    import matplotlib
+    matplotlib.use('Agg')  # non-interactive; figures are only saved to file
+    import matplotlib.pyplot as plt
         
     plt.figure(figsize=(10, 8))
     
     # Sort by Ex
-    sorted_ex = sorted(states.keys())
+    ex_values = np.fromiter(states.keys(), dtype=float, count=len(states))
+    tables = list(states.values())
+    order = np.argsort(ex_values, kind='stable')
     
-    colors = plt.cm.viridis(np.linspace(0, 1, len(sorted_ex)))
+    colors = plt.cm.viridis(np.linspace(0, 1, len(order)))
     
-    for i, ex in enumerate(sorted_ex):
-        ang, xs = states[ex]
+    rasterize = len(order) > RASTERIZE_MIN_STATES
+    for i, k in enumerate(order):
+        ex = ex_values[k]
+        ang, xs = tables[k]
         label = f"Ex = {ex:.1f} MeV"
-        plt.plot(ang, xs, label=label, color=colors[i], linewidth=2)
+        plt.plot(ang, xs, label=label, color=colors[i], linewidth=2, rasterized=rasterize)
         
     plt.xlabel("CM Angle (deg)")
     plt.ylabel("Cross Section (mb/sr)")
@@ -102,9 +62,15 @@ def main():
     plt.grid(True, alpha=0.3)
     plt.yscale('log')
     
-    output_png = filename.replace('.out', '_overlay.png')
-    plt.savefig(output_png, dpi=300)
+    plt.savefig(output_png, dpi=dpi, format=fmt, bbox_inches='tight')
+    plt.close()
     print(f"Plot saved to {output_png}")
 
+def main():
+    plot_files_main(
+        "Overlay the cross sections of a DWUCK4 excitation-energy scan.",
+        "python3 tools/plot_scan_overlay.py outputs/36S_scan_7MeV.out",
+        parse_dwuck_output, plot_overlay, '_overlay.{fmt}')
+
 if __name__ == "__main__":
     main()
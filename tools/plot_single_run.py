@@ -1,79 +1,36 @@
-import matplotlib.pyplot as plt
-import sys
-import numpy as np
+from _dwuck_parse import cached_parse, parse, plot_files_main
 
-def parse_dwuck_output(filename):
+def _run_records(filename):
+    """Table records of the "bound ZR"/"unbound ZR" states in filename."""
+    return parse(filename, title_filter=lambda line: "bound ZR" in line)
+
+def parse_dwuck_output(filename, cache=False):
     """
     Parse DWUCK4 output to extract cross sections for each state.
     Returns a dict: {label: (angles, cross_sections)}
+    With cache=True the parsed tables are kept in an "<output>.run.npz"
+    file next to the output until it changes.
     """
-    states = {}
-    current_label = None
-    angles = []
-    xsecs = []
-    capture_data = False
-    
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-        
-    for line in lines:
-        # Check for new state header
-        # Use simple logic: if "36S(d,p)" and "bound ZR" or "unbound ZR"
-        if "36S(d,p)" in line and ("bound ZR" in line or "unbound ZR" in line):
-            # If we were capturing, save previous state
-            if current_label is not None and angles:
-                states[current_label] = (np.array(angles), np.array(xsecs))
-                angles = []
-                xsecs = []
-            
-            # Extract Label (entire line trimmed)
-            current_label = line.strip()
-            capture_data = False
-            
-        if "Tot-sig" in line:
-            capture_data = False
-            continue
+    # State titles are the "36S(d,p)" lines ending in "bound ZR" or "unbound ZR";
+    # the label is the entire title line, trimmed
+    return {
+        state['title']: (state['theta'], state['cross_section'])
+        for state in cached_parse(filename, _run_records, 'run', cache)
+    }
 
-        # Check for cross section data block start
-        if "Theta" in line and "Inelsig" in line:
-            capture_data = True
-            continue
-            
-        if capture_data:
-            # Data lines: Angle  Inelsig ...
-            try:
-                parts = line.strip().split()
-                if len(parts) >= 2:
-                     try:
-                        ang = float(parts[0])
-                        xs = float(parts[1]) # Inelsig is col 1
-                     except ValueError:
-                        continue
-                     angles.append(ang)
-                     xsecs.append(xs)
-            except ValueError:
-                pass
-                
-    # Save last state
-    if current_label is not None and angles:
-        states[current_label] = (np.array(angles), np.array(xsecs))
-        
-    return states
+# Above this many curves, lines are rasterized to keep the saved file small
+RASTERIZE_MIN_STATES = 20
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 tools/plot_single_run.py outputs/DW_36S_DP.out")
-        sys.exit(1)
-        
-    filename = sys.argv[1]
-    states = parse_dwuck_output(filename)
-    
-    if not states:
-        print("No states found in output.")
-        sys.exit(1)
+def plot_run(states, output_png, dpi, fmt):
+    """Plot every state of one run and save the figure to output_png."""
+    # Imported only once there is something to plot
+    import matplotlib
+    matplotlib.use('Agg')  # non-interactive; figures are only saved to file
+    import matplotlib.pyplot as plt
         
     plt.figure(figsize=(10, 8))
     
+    rasterize = len(states) > RASTERIZE_MIN_STATES
     for i, (label, (ang, xs)) in enumerate(states.items()):
         # Shorten label for legend
         # "100100... 36S(d,p)... 0 keV 0f7/2 bound ZR" -> "0 keV 0f7/2"
@@ -84,7 +41,7 @@ def main():
         except:
             short_label = label[:20]
             
-        plt.plot(ang, xs, label=short_label, linewidth=2)
+        plt.plot(ang, xs, label=short_label, linewidth=2, rasterized=rasterize)
         
     plt.xlabel("CM Angle (deg)")
     plt.ylabel("Cross Section (mb/sr)")
@@ -93,9 +50,15 @@ def main():
     plt.grid(True, alpha=0.3)
     plt.yscale('log')
     
-    output_png = filename.replace('.out', '.png')
-    plt.savefig(output_png, dpi=300)
+    plt.savefig(output_png, dpi=dpi, format=fmt, bbox_inches='tight')
+    plt.close()
     print(f"Plot saved to {output_png}")
 
+def main():
+    plot_files_main(
+        "Plot the cross sections of every state in a DWUCK4 run.",
+        "python3 tools/plot_single_run.py outputs/DW_36S_DP.out",
+        parse_dwuck_output, plot_run, '.{fmt}')
+
 if __name__ == "__main__":
     main()